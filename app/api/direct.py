@@ -5,6 +5,7 @@ import urllib.parse
 from typing import Any
 
 import httpx
+from cachetools import TTLCache
 from fastapi import Depends
 from fastapi import Path
 from fastapi import Query
@@ -32,6 +33,9 @@ DIRECT_MAP_INFO_FMTSTR = (
     "{{cs: {CS} / od: {OD} / ar: {AR} / hp: {HP}}}@{Mode}"
 )
 
+# beatmapset card lookups, shared between players viewing the same set
+_beatmapset_cache: TTLCache[int, dict[str, Any]] = TTLCache(maxsize=1024, ttl=60)
+
 
 async def osu_direct(
     user: User = Depends(authenticate_user(Query, "u", "h")),
@@ -151,25 +155,30 @@ async def beatmap_card(
 
         map_set_id = bmap.set_id
 
-    url = f"{config.BEATMAPS_SERVICE_BASE_URL}/public/api/s/{map_set_id}"
-    try:
-        response = await app.state.services.http_client.get(url, timeout=15)
-        if response.status_code == status.HTTP_404_NOT_FOUND:
-            return Response(status_code=status.HTTP_404_NOT_FOUND)
-        response.raise_for_status()
-    except Exception:
-        logging.exception(
-            "Failed to retrieve data from the in osu-search-set.php",
-            extra={
-                "beatmapset_id": map_set_id,
-                "beatmap_id": map_id,
-                "url": url,
-                "user_id": user.id,
-            },
-        )
-        return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    assert map_set_id is not None
+
+    json_data = _beatmapset_cache.get(map_set_id)
+    if json_data is None:
+        url = f"{config.BEATMAPS_SERVICE_BASE_URL}/public/api/s/{map_set_id}"
+        try:
+            response = await app.state.services.http_client.get(url, timeout=15)
+            if response.status_code == status.HTTP_404_NOT_FOUND:
+                return Response(status_code=status.HTTP_404_NOT_FOUND)
+            response.raise_for_status()
+        except Exception:
+            logging.exception(
+                "Failed to retrieve data from the in osu-search-set.php",
+                extra={
+                    "beatmapset_id": map_set_id,
+                    "beatmap_id": map_id,
+                    "url": url,
+                    "user_id": user.id,
+                },
+            )
+            return Response(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-    json_data = response.json()
+        json_data = response.json()
+        _beatmapset_cache[map_set_id] = json_data
 
     if config.AMPLITUDE_API_KEY:
         job_scheduling.schedule_job(
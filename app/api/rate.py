@@ -63,6 +63,7 @@ async def rate_map(
     if user_rating:
         new_rating = await add_rating(user.id, map_md5, user_rating)
         beatmap.rating = new_rating
+        await app.usecases.akatsuki_beatmaps.invalidate_beatmap(beatmap)
 
         if config.AMPLITUDE_API_KEY:
             job_scheduling.schedule_job(
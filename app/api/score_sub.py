@@ -7,8 +7,6 @@ import time
 from base64 import b64decode
 from base64 import b64encode
 from copy import copy
-from datetime import datetime
-from datetime import timezone
 from typing import NamedTuple
 from typing import TypeVar
 
@@ -603,9 +601,9 @@ async def submit_score(
 
     achievements_str = "/".join(ach.full_name for ach in new_achievements)
 
-    beatmap_last_update_datetime = datetime.fromtimestamp(
-        beatmap.last_update,
-        tz=timezone.utc,
+    beatmap_approved_date = time.strftime(
+        "%Y-%m-%d %H:%M:%S",
+        time.gmtime(beatmap.last_update),
     )
 
     submission_charts = [
@@ -613,7 +611,7 @@ async def submit_score(
         f"beatmapSetId:{beatmap.set_id}",
         f"beatmapPlaycount:{beatmap.plays}",
         f"beatmapPasscount:{beatmap.passes}",
-        f"approvedDate:{beatmap_last_update_datetime:%Y-%m-%d %H:%M:%S}",
+        f"approvedDate:{beatmap_approved_date}",
         "\n",
         "chartId:beatmap",
         f"chartUrl:{beatmap.set_url}",
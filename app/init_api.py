@@ -83,10 +83,17 @@ def init_events(asgi_app: FastAPI) -> None:
 
         await app.state.cache.init_cache()
 
+        job_scheduling.schedule_job(
+            app.usecases.akatsuki_beatmaps.run_playcount_flusher(),
+        )
+
         logging.info("Server has started!")
 
     @asgi_app.on_event("shutdown")
     async def on_shutdown() -> None:
+        # the flusher writes any remaining playcounts before exiting
+        app.usecases.akatsuki_beatmaps.stop_playcount_flusher()
+
         await job_scheduling.await_running_jobs(timeout=7.5)
 
         await app.state.services.database.disconnect()
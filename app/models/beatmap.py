@@ -2,16 +2,26 @@ from __future__ import annotations
 
 from collections.abc import Mapping
 from dataclasses import dataclass
-from datetime import datetime
-from datetime import timedelta
 from typing import Any
 
+import orjson
+
 import config
 from app.constants.mode import Mode
 from app.constants.ranked_status import RankedStatus
 
+# SRV_URL is fixed for the lifetime of the process
+_SERVER_URL = config.SRV_URL.replace("https://", "").replace("http://", "")
+_OSU_BASE_URL = f"https://osu.{_SERVER_URL}"
+
+# plain dict lookups avoid the validation overhead of `EnumMeta.__call__`
+_RANKED_STATUSES: dict[int, RankedStatus] = {
+    status.value: status for status in RankedStatus
+}
+_MODES: dict[int, Mode] = {mode.value: mode for mode in Mode}
 
-@dataclass
+
+@dataclass(slots=True)
 class Beatmap:
     md5: str
     id: int
@@ -48,15 +58,11 @@ class Beatmap:
 
     @property
     def url(self) -> str:
-        server_url = config.SRV_URL.replace("https://", "").replace("http://", "")
-
-        return f"https://osu.{server_url}/beatmaps/{self.id}"
+        return f"{_OSU_BASE_URL}/beatmaps/{self.id}"
 
     @property
     def set_url(self) -> str:
-        server_url = config.SRV_URL.replace("https://", "").replace("http://", "")
-
-        return f"https://osu.{server_url}/beatmapsets/{self.set_id}"
+        return f"{_OSU_BASE_URL}/beatmapsets/{self.set_id}"
 
     @property
     def embed(self) -> str:
@@ -96,9 +102,19 @@ class Beatmap:
             "ranked_status_freezed": self.frozen,
             "rankedby": self.rankedby,
             "rating": self.rating,
-            "bancho_ranked_status": self.bancho_ranked_status,
+            "bancho_ranked_status": (
+                self.bancho_ranked_status.value
+                if self.bancho_ranked_status is not None
+                else None
+            ),
+            "count_circles": self.count_circles,
+            "count_sliders": self.count_sliders,
+            "count_spinners": self.count_spinners,
         }
 
+    def to_json_bytes(self) -> bytes:
+        return orjson.dumps(self.to_dict())
+
     @classmethod
     def from_mapping(cls, mapping: Mapping[str, Any]) -> Beatmap:
         return cls(
@@ -106,10 +122,10 @@ class Beatmap:
             id=mapping["beatmap_id"],
             set_id=mapping["beatmapset_id"],
             song_name=mapping["song_name"],
-            status=RankedStatus(mapping["ranked"]),
+            status=_RANKED_STATUSES[mapping["ranked"]],
             plays=mapping["playcount"],
             passes=mapping["passcount"],
-            mode=Mode(mapping["mode"]),
+            mode=_MODES[mapping["mode"]],
             od=mapping["od"],
             ar=mapping["ar"],
             hit_length=mapping["hit_length"],
@@ -121,7 +137,7 @@ class Beatmap:
             rankedby=mapping["rankedby"],
             rating=mapping["rating"],
             bancho_ranked_status=(
-                RankedStatus(mapping["bancho_ranked_status"])
+                _RANKED_STATUSES[mapping["bancho_ranked_status"]]
                 if mapping["bancho_ranked_status"] is not None
                 else None
             ),
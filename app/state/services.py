@@ -81,6 +81,14 @@ class Database:
     ) -> None:
         await self.write_database.execute_many(query, values)
 
+    async def execute_many_in_transaction(
+        self,
+        query: ClauseElement | str,
+        values: list[Any],
+    ) -> None:
+        async with self.write_database.transaction():
+            await self.write_database.execute_many(query, values)
+
 
 database = Database(
     read_dsn="mysql+asyncmy://{username}:{password}@{host}:{port}/{db}".format(
@@ -1,63 +1,192 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import random
+import time
+from collections.abc import Callable
+from collections.abc import Coroutine
 from typing import Any
+from typing import NamedTuple
+from typing import TypeVar
 
 import httpx
+import orjson
+from cachetools import TLRUCache
+from cachetools import TTLCache
+from tenacity import retry
+from tenacity import wait_exponential
+from tenacity.stop import stop_after_attempt
 
 import app.state
 import config
-from app.constants.mode import Mode
 from app.constants.ranked_status import RankedStatus
 from app.models.beatmap import Beatmap
+from app.reliability import retry_if_exception_network_related
 
 beatmaps_service_http_client = httpx.AsyncClient(
     base_url=config.BEATMAPS_SERVICE_BASE_URL,
+    http2=True,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+    timeout=httpx.Timeout(10.0, connect=3.0),
 )
 
 
-def _remap_beatmap_to_score_service_model(beatmap: dict[str, Any]) -> Beatmap:
-    return Beatmap(
-        md5=beatmap["beatmap_md5"],
-        id=beatmap["beatmap_id"],
-        set_id=beatmap["beatmapset_id"],
-        song_name=beatmap["song_name"],
-        status=RankedStatus(beatmap["ranked"]),
-        plays=beatmap["playcount"],
-        passes=beatmap["passcount"],
-        mode=Mode(beatmap["mode"]),
-        od=beatmap["od"],
-        ar=beatmap["ar"],
-        hit_length=beatmap["hit_length"],
-        last_update=beatmap["latest_update"],
-        max_combo=beatmap["max_combo"],
-        bpm=beatmap["bpm"],
-        filename=beatmap["file_name"],
-        frozen=beatmap["ranked_status_freezed"],
-        rankedby=beatmap["rankedby"],
-        rating=beatmap["rating"],
-        bancho_ranked_status=(
-            RankedStatus(beatmap["bancho_ranked_status"])
-            if beatmap["bancho_ranked_status"] is not None
-            else None
-        ),
-        count_circles=beatmap["count_circles"],
-        count_sliders=beatmap["count_sliders"],
-        count_spinners=beatmap["count_spinners"],
-    )
+class _CachedBeatmap(NamedTuple):
+    beatmap: Beatmap
+    expires_at: float  # in `time.monotonic` time
 
 
-async def fetch_by_md5(beatmap_md5: str, /) -> Beatmap | None:
+def _cached_beatmap_ttu(_key: Any, value: _CachedBeatmap, _now: float) -> float:
+    return value.expires_at
+
+
+# both keyspaces reference the same `Beatmap` instances,
+# so in-place mutations (e.g. playcount) stay coherent.
+_beatmaps_by_md5: TLRUCache[str, _CachedBeatmap] = TLRUCache(
+    maxsize=8192,
+    ttu=_cached_beatmap_ttu,
+    timer=time.monotonic,
+)
+_beatmaps_by_id: TLRUCache[int, _CachedBeatmap] = TLRUCache(
+    maxsize=8192,
+    ttu=_cached_beatmap_ttu,
+    timer=time.monotonic,
+)
+
+# md5s which beatmaps-service does not know about (e.g. unsubmitted maps),
+# so that repeated lookups from client retries don't reach the service.
+_missing_beatmap_md5s: TTLCache[str, bool] = TTLCache(maxsize=4096, ttl=600)
+
+# lookups currently in progress; concurrent callers await the same request
+_inflight_by_md5: dict[str, asyncio.Task[Beatmap | None]] = {}
+_inflight_by_id: dict[int, asyncio.Task[Beatmap | None]] = {}
+
+K = TypeVar("K", str, int)
+
+PLAYCOUNT_FLUSH_INTERVAL = 0.5  # in seconds
+
+# playcount & passcount increments not yet written to the database, by md5
+_pending_playcounts: dict[str, tuple[int, int]] = {}
+_playcount_flusher_stopping = asyncio.Event()
+
+# how long beatmaps may be served from the in-process cache and the redis
+# mirror (shared between workers) before being looked up again. playcounts,
+# ratings and statuses change under us, so these are kept short.
+_CACHE_TTLS: dict[RankedStatus, int] = {
+    RankedStatus.QUALIFIED: 60,
+}
+_DEFAULT_CACHE_TTL = 300
+
+
+def _get_cache_ttl(beatmap: Beatmap) -> int:
+    return _CACHE_TTLS.get(beatmap.status, _DEFAULT_CACHE_TTL)
+
+
+def _cache_beatmap(beatmap: Beatmap, ttl: int) -> None:
+    entry = _CachedBeatmap(beatmap, expires_at=time.monotonic() + ttl)
+    _beatmaps_by_md5[beatmap.md5] = entry
+    _beatmaps_by_id[beatmap.id] = entry
+    _missing_beatmap_md5s.pop(beatmap.md5, None)
+
+
+# bump whenever the `Beatmap.to_dict` payload changes shape
+_REDIS_CACHE_VERSION = 1
+
+
+def _make_md5_redis_key(beatmap_md5: str) -> str:
+    return f"less:beatmaps:v{_REDIS_CACHE_VERSION}:md5:{beatmap_md5}"
+
+
+def _make_id_redis_key(beatmap_id: int) -> str:
+    return f"less:beatmaps:v{_REDIS_CACHE_VERSION}:id:{beatmap_id}"
+
+
+async def _fetch_from_redis(key: str) -> tuple[Beatmap, int] | None:
+    """Fetch a beatmap from the redis mirror, along with its remaining ttl."""
     try:
-        response = await beatmaps_service_http_client.get(
-            "/api/akatsuki/v1/beatmaps/lookup",
-            params={"beatmap_md5": beatmap_md5},
+        async with app.state.services.redis.pipeline() as pipeline:
+            pipeline.get(key)  # type: ignore[unused-awaitable]
+            pipeline.ttl(key)  # type: ignore[unused-awaitable]
+            payload, remaining_ttl = await pipeline.execute()
+
+        if payload is None:
+            return None
+
+        return Beatmap.from_mapping(orjson.loads(payload)), remaining_ttl
+    except Exception:
+        logging.exception(
+            "Failed to fetch beatmap from redis",
+            extra={"key": key},
+        )
+        return None
+
+
+async def _save_to_redis(beatmap: Beatmap) -> None:
+    ttl = _get_cache_ttl(beatmap)
+    # stretch the ttl by up to 10%, so that keys for a popular beatmap
+    # written around the same time don't all expire at the same instant
+    ttl += random.randint(0, ttl // 10)
+    payload = beatmap.to_json_bytes()
+
+    try:
+        async with app.state.services.redis.pipeline() as pipeline:
+            pipeline.set(_make_md5_redis_key(beatmap.md5), payload, ex=ttl)  # type: ignore[unused-awaitable]
+            pipeline.set(_make_id_redis_key(beatmap.id), payload, ex=ttl)  # type: ignore[unused-awaitable]
+            await pipeline.execute()
+    except Exception:
+        logging.exception(
+            "Failed to save beatmap to redis",
+            extra={"beatmap_md5": beatmap.md5, "beatmap_id": beatmap.id},
+        )
+
+
+async def invalidate_beatmap(beatmap: Beatmap) -> None:
+    """Remove a beatmap from the redis mirror, e.g. after it was modified."""
+    try:
+        await app.state.services.redis.delete(
+            _make_md5_redis_key(beatmap.md5),
+            _make_id_redis_key(beatmap.id),
+        )
+    except Exception:
+        logging.exception(
+            "Failed to remove beatmap from redis",
+            extra={"beatmap_md5": beatmap.md5, "beatmap_id": beatmap.id},
         )
-        if response.status_code == 404:
+
+
+@retry(
+    retry=retry_if_exception_network_related(),
+    wait=wait_exponential(max=2),
+    stop=stop_after_attempt(3),
+    reraise=True,
+)
+async def _request_beatmap_lookup(params: dict[str, Any]) -> dict[str, Any] | None:
+    response = await beatmaps_service_http_client.get(
+        "/api/akatsuki/v1/beatmaps/lookup",
+        params=params,
+    )
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    response_data: dict[str, Any] = orjson.loads(response.content)
+    return response_data
+
+
+async def _lookup_by_md5(beatmap_md5: str) -> Beatmap | None:
+    redis_result = await _fetch_from_redis(_make_md5_redis_key(beatmap_md5))
+    if redis_result is not None:
+        beatmap, remaining_ttl = redis_result
+        # don't keep the beatmap around for longer than the mirror would
+        _cache_beatmap(beatmap, min(remaining_ttl, _get_cache_ttl(beatmap)))
+        return beatmap
+
+    try:
+        response_data = await _request_beatmap_lookup({"beatmap_md5": beatmap_md5})
+        if response_data is None:
+            _missing_beatmap_md5s[beatmap_md5] = True
             return None
-        response.raise_for_status()
-        response_data = response.json()
-        return _remap_beatmap_to_score_service_model(response_data)
+        beatmap = Beatmap.from_mapping(response_data)
     except Exception:
         logging.exception(
             "Failed to fetch beatmap by md5 from beatmaps-service",
@@ -65,18 +194,24 @@ async def fetch_by_md5(beatmap_md5: str, /) -> Beatmap | None:
         )
         return None
 
+    _cache_beatmap(beatmap, _get_cache_ttl(beatmap))
+    await _save_to_redis(beatmap)
+    return beatmap
+
+
+async def _lookup_by_id(beatmap_id: int) -> Beatmap | None:
+    redis_result = await _fetch_from_redis(_make_id_redis_key(beatmap_id))
+    if redis_result is not None:
+        beatmap, remaining_ttl = redis_result
+        # don't keep the beatmap around for longer than the mirror would
+        _cache_beatmap(beatmap, min(remaining_ttl, _get_cache_ttl(beatmap)))
+        return beatmap
 
-async def fetch_by_id(beatmap_id: int, /) -> Beatmap | None:
     try:
-        response = await beatmaps_service_http_client.get(
-            "/api/akatsuki/v1/beatmaps/lookup",
-            params={"beatmap_id": beatmap_id},
-        )
-        if response.status_code == 404:
+        response_data = await _request_beatmap_lookup({"beatmap_id": beatmap_id})
+        if response_data is None:
             return None
-        response.raise_for_status()
-        response_data = response.json()
-        return _remap_beatmap_to_score_service_model(response_data)
+        beatmap = Beatmap.from_mapping(response_data)
     except Exception:
         logging.exception(
             "Failed to fetch beatmap by id from beatmaps-service",
@@ -84,6 +219,57 @@ async def fetch_by_id(beatmap_id: int, /) -> Beatmap | None:
         )
         return None
 
+    _cache_beatmap(beatmap, _get_cache_ttl(beatmap))
+    await _save_to_redis(beatmap)
+    return beatmap
+
+
+async def _fetch_single_flight(
+    inflight: dict[K, asyncio.Task[Beatmap | None]],
+    key: K,
+    fetch: Callable[[K], Coroutine[Any, Any, Beatmap | None]],
+) -> Beatmap | None:
+    """\
+    Fetch a beatmap, sharing a single request between concurrent callers.
+
+    The request runs in its own task which is shielded from the callers,
+    so a cancelled caller will not cancel the request for everyone else.
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(fetch(key))
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+        inflight[key] = task
+
+    return await asyncio.shield(task)
+
+
+async def fetch_by_md5(beatmap_md5: str, /) -> Beatmap | None:
+    if beatmap_md5 in _missing_beatmap_md5s:
+        return None
+
+    cached = _beatmaps_by_md5.get(beatmap_md5)
+    if cached is not None:
+        return cached.beatmap
+
+    return await _fetch_single_flight(
+        _inflight_by_md5,
+        beatmap_md5,
+        _lookup_by_md5,
+    )
+
+
+async def fetch_by_id(beatmap_id: int, /) -> Beatmap | None:
+    cached = _beatmaps_by_id.get(beatmap_id)
+    if cached is not None:
+        return cached.beatmap
+
+    return await _fetch_single_flight(
+        _inflight_by_id,
+        beatmap_id,
+        _lookup_by_id,
+    )
+
 
 async def increment_playcount(
     *,
@@ -95,7 +281,77 @@ async def increment_playcount(
     if increment_passcount:
         beatmap.passes += 1
 
-    await app.state.services.database.execute(
-        "UPDATE beatmaps SET passcount = passcount + :passcount_increment, playcount = playcount + 1 WHERE beatmap_md5 = :md5",
-        {"passcount_increment": int(increment_passcount), "md5": beatmap.md5},
-    )
+    # the database is updated in batches by `flush_playcounts`
+    plays, passes = _pending_playcounts.get(beatmap.md5, (0, 0))
+    _pending_playcounts[beatmap.md5] = (plays + 1, passes + int(increment_passcount))
+
+
+async def flush_playcounts() -> bool:
+    """\
+    Write all pending playcount & passcount increments to the database.
+
+    Returns whether the flush succeeded; on failure the increments are kept.
+    """
+    if not _pending_playcounts:
+        return True
+
+    # a consistent row order across workers avoids lock-order deadlocks
+    pending = sorted(_pending_playcounts.items())
+    _pending_playcounts.clear()
+
+    try:
+        # all-or-nothing, so a failed flush can be safely retried
+        await app.state.services.database.execute_many_in_transaction(
+            "UPDATE beatmaps SET playcount = playcount + :plays, passcount = passcount + :passes WHERE beatmap_md5 = :md5",
+            [
+                {"plays": plays, "passes": passes, "md5": md5}
+                for md5, (plays, passes) in pending
+            ],
+        )
+    except Exception:
+        logging.exception(
+            "Failed to flush beatmap playcounts to the database",
+            extra={"beatmap_count": len(pending)},
+        )
+
+        # keep the increments around for the next flush
+        for md5, (plays, passes) in pending:
+            pending_plays, pending_passes = _pending_playcounts.get(md5, (0, 0))
+            _pending_playcounts[md5] = (pending_plays + plays, pending_passes + passes)
+
+        return False
+
+    return True
+
+
+async def run_playcount_flusher() -> None:
+    """\
+    Periodically flush pending playcounts until `stop_playcount_flusher` is called.
+
+    Before returning, pending playcounts are flushed until none remain,
+    or until a flush fails, in which case the remaining ones are dropped.
+    """
+    while not _playcount_flusher_stopping.is_set():
+        try:
+            await asyncio.wait_for(
+                _playcount_flusher_stopping.wait(),
+                timeout=PLAYCOUNT_FLUSH_INTERVAL,
+            )
+        except asyncio.TimeoutError:
+            pass
+
+        await flush_playcounts()
+
+    # increments may have been queued while the last flush was in progress
+    while _pending_playcounts:
+        if not await flush_playcounts():
+            logging.error(
+                "Dropping unflushed beatmap playcounts",
+                extra={"playcounts": dict(_pending_playcounts)},
+            )
+            _pending_playcounts.clear()
+            break
+
+
+def stop_playcount_flusher() -> None:
+    _playcount_flusher_stopping.set()